@@ -1,26 +1,72 @@
 from flask import Flask, render_template, request, jsonify, redirect, url_for
 import os
+import shutil
 from werkzeug.utils import secure_filename
 import json
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+
+import numpy as np
 
 from utils.document_processor import process_pdf
-from utils.vector_store1 import VectorStore
-from utils.groq_client import GroqClient
+from utils.services import get_vector_store1 as get_vector_store, get_groq_client
+from utils.semantic_cache import SemanticCache
+from utils.json_provider import ORJSONProvider
 from config import UPLOAD_FOLDER, ALLOWED_EXTENSIONS
 
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 32 * 2048 * 2048  # 16MB max upload
+app.config['MAX_CONTENT_LENGTH'] = 32 * 1024 * 1024  # 32MB max upload
+
+# The vector store (utils.vector_store1) and Groq client are created on first use (utils/services.py)
+semantic_cache = SemanticCache(capacity=256, threshold=0.95)
 
-# Initialize services
-vector_store = VectorStore()
-groq_client = GroqClient()
+# Concurrent requests share the vector store, so serialize access to it
+vector_store_lock = threading.Lock()
+
+# Speech recognition blocks on Google's API, so it runs off the request thread
+stt_pool = ThreadPoolExecutor(max_workers=8)
+STT_TIMEOUT = 30  # seconds a request waits for a transcription
 
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    _, dot, ext = filename.rpartition('.')
+    return bool(dot) and ext.lower() in ALLOWED_EXTENSIONS
+
+@lru_cache(maxsize=1024)
+def embed_query(text):
+    # The semantic cache needs the store's embedding model; without one it is
+    # skipped (utils/services.py logs that once when the store is created)
+    embed = getattr(get_vector_store(), '_embed', None)
+    if embed is None:
+        return None
+    with vector_store_lock:
+        embedding = np.array(embed(text), dtype=np.float32)
+    # Cached arrays are shared between requests, so hand them out read-only
+    embedding.flags.writeable = False
+    return embedding
+
+# The manual listing is cached against the upload folder's mtime, which
+# changes whenever a file is added or removed by any process
+_manuals_cache = (None, [])
+
+def get_manuals():
+    global _manuals_cache
+    mtime = os.stat(UPLOAD_FOLDER).st_mtime_ns
+    cached_mtime, manuals = _manuals_cache
+    if cached_mtime != mtime:
+        with os.scandir(UPLOAD_FOLDER) as entries:
+            manuals = [e.name for e in entries if e.is_file() and e.name.endswith('.pdf')]
+        _manuals_cache = (mtime, manuals)
+    return manuals
 
 @app.route('/')
 def index():
@@ -28,12 +74,8 @@ def index():
 
 @app.route('/admin')
 def admin():
-    # Get list of uploaded manuals
-    manuals = []
-    for filename in os.listdir(UPLOAD_FOLDER):
-        if filename.endswith('.pdf'):
-            manuals.append(filename)
-    return render_template('admin.html', manuals=manuals)
+    logger.info(f"Query embedding cache: {embed_query.cache_info()}")
+    return render_template('admin.html', manuals=list(get_manuals()))
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
@@ -48,13 +90,17 @@ def upload_file():
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        # Copy in 1MB blocks rather than FileStorage.save()'s 16KB default
+        with open(filepath, 'wb') as out:
+            shutil.copyfileobj(file.stream, out, length=1024 * 1024)
         
         # Process the PDF and add to vector store
         try:
             product_name = request.form.get('product_name', os.path.splitext(filename)[0])
             chunks = process_pdf(filepath, product_name)
-            vector_store.add_documents(chunks)
+            with vector_store_lock:
+                get_vector_store().add_documents(chunks)
+            semantic_cache.clear()  # Cached answers may be stale with new manuals
             return jsonify({"success": True, "message": f"File {filename} processed successfully"}), 200
         except Exception as e:
             return jsonify({"error": str(e)}), 500
@@ -70,8 +116,21 @@ def query():
         return jsonify({"error": "Query is empty"}), 400
     
     try:
+        # Answer near-duplicate questions from the semantic cache, skipping search and the LLM
+        cache_generation = semantic_cache.generation
+        query_embedding = embed_query(query_text)
+        if query_embedding is not None:
+            cached = semantic_cache.get(query_embedding)
+            if cached is not None:
+                response, sources = cached
+                return jsonify({
+                    "response": response,
+                    "sources": sources
+                })
+        
         # Get similar documents from vector store
-        similar_docs = vector_store.search(query_text, k=3)
+        with vector_store_lock:
+            similar_docs = get_vector_store().search(query_text, k=3)
         
         # Format the context properly
         context = ""
@@ -85,12 +144,15 @@ def query():
                     sources.append(doc['source'])
         
         # Use Groq to generate a response
-        response = groq_client.generate_response(query_text, context)
+        response = get_groq_client().generate_response(query_text, context)
         
         # Ensure we're returning a proper string response
         if not isinstance(response, str):
             response = str(response)
         
+        if query_embedding is not None:
+            semantic_cache.put(query_embedding, response, sources, generation=cache_generation)
+        
         return jsonify({
             "response": response,
             "sources": sources
@@ -104,6 +166,21 @@ def query():
             "sources": []
         }), 500
 
+def recognize_speech(audio_path):
+    # Runs on stt_pool; owns the temporary audio file and always removes it
+    try:
+        from speech_recognition import Recognizer, AudioFile
+        
+        recognizer = Recognizer()
+        # Give up on the API call just before the request does, so a hung call
+        # frees its pool thread instead of holding it forever
+        recognizer.operation_timeout = STT_TIMEOUT - 2
+        with AudioFile(audio_path) as source:
+            audio_data = recognizer.record(source)
+        return recognizer.recognize_google(audio_data)
+    finally:
+        os.remove(audio_path)
+
 @app.route('/speech-to-text', methods=['POST'])
 def speech_to_text():
     if 'audio' not in request.files:
@@ -119,19 +196,13 @@ def speech_to_text():
     audio_file.save(temp_path)
     
     try:
-        from speech_recognition import Recognizer, AudioFile
-        
-        recognizer = Recognizer()
-        with AudioFile(temp_path) as source:
-            audio_data = recognizer.record(source)
-            text = recognizer.recognize_google(audio_data)
-        
-        os.remove(temp_path)  # Clean up
+        text = stt_pool.submit(recognize_speech, temp_path).result(timeout=STT_TIMEOUT)
         return jsonify({"text": text})
+    except FutureTimeoutError:
+        return jsonify({"error": "Speech recognition timed out"}), 504
     except Exception as e:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
         return jsonify({"error": str(e)}), 500
 
+# Development server only; deploy with `gunicorn wsgi:app` (see gunicorn.conf.py)
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -1,13 +1,31 @@
 from flask import Flask, render_template, request, jsonify, redirect, url_for, session
 import os
+import shutil
 from werkzeug.utils import secure_filename
+from flask_session import Session
+from cachelib.file import FileSystemCache
 import json
+import threading
 import logging
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, CancelledError, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache, partial
+
+import numpy as np
+
+try:
+    from gevent import get_hub
+    from gevent.monkey import is_module_patched
+except ImportError:  # gevent is only needed for the Gunicorn deployment
+    get_hub = None
 
 from utils.document_processor import process_pdf
-from utils.vector_store import VectorStore  # Fixed import
-from utils.groq_client import GroqClient
-from config import UPLOAD_FOLDER, ALLOWED_EXTENSIONS
+from utils.services import get_vector_store, get_groq_client
+from utils.semantic_cache import SemanticCache
+from utils.json_provider import ORJSONProvider
+from config import UPLOAD_FOLDER, ALLOWED_EXTENSIONS, SESSION_FOLDER
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, 
@@ -17,19 +35,87 @@ logging.basicConfig(level=logging.INFO,
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 32 * 1024 * 1024  # 32MB max upload
 app.secret_key = os.urandom(24)  # For session management
 
-# Initialize services
-vector_store = VectorStore()
-groq_client = GroqClient()
+# Keep session data server-side; the cookie only carries the session id
+app.config['SESSION_TYPE'] = 'cachelib'
+app.config['SESSION_CACHELIB'] = FileSystemCache(cache_dir=SESSION_FOLDER)
+app.config['PERMANENT_SESSION_LIFETIME'] = 30 * 60
+Session(app)
+
+# The vector store and Groq client are created on first use (utils/services.py)
+semantic_cache = SemanticCache(capacity=256, threshold=0.95)
+
+# Concurrent requests share the vector store, so serialize access to it
+vector_store_lock = threading.Lock()
+
+# PDFs are parsed in worker processes so uploads don't tie up the request
+# worker; their chunks are indexed back in this process once ready
+PDF_WORKERS = min(4, os.cpu_count() or 1)
+pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+pdf_pool_lock = threading.Lock()
+upload_jobs = {}  # job id -> status reported by /upload/status
+UPLOAD_JOB_TTL = 60 * 60  # seconds a finished job stays visible to /upload/status
+
+# Speech recognition blocks on Google's API, so it runs off the request thread
+stt_pool = ThreadPoolExecutor(max_workers=8)
+STT_TIMEOUT = 30  # seconds a request waits for a transcription
 
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    _, dot, ext = filename.rpartition('.')
+    return bool(dot) and ext.lower() in ALLOWED_EXTENSIONS
+
+@lru_cache(maxsize=1024)
+def embed_query(text):
+    # The semantic cache needs the store's embedding model; without one it is
+    # skipped (utils/services.py logs that once when the store is created)
+    embed = getattr(get_vector_store(), '_embed', None)
+    if embed is None:
+        return None
+    with vector_store_lock:
+        embedding = np.array(embed(text), dtype=np.float32)
+    # Cached arrays are shared between requests, so hand them out read-only
+    embedding.flags.writeable = False
+    return embedding
+
+# The manual listing is cached against the upload folder's mtime, which
+# changes whenever a file is added or removed by any process; the product
+# set is built once and then extended with each upload's chunks
+_manuals_cache = (None, [])
+_products_cache = None
+
+def get_manuals():
+    global _manuals_cache
+    try:
+        mtime = os.stat(UPLOAD_FOLDER).st_mtime_ns
+        cached_mtime, manuals = _manuals_cache
+        if cached_mtime != mtime:
+            with os.scandir(UPLOAD_FOLDER) as entries:
+                manuals = [e.name for e in entries if e.is_file() and e.name.endswith('.pdf')]
+            _manuals_cache = (mtime, manuals)
+        return manuals
+    except Exception as e:
+        logger.error(f"Error reading manuals directory: {str(e)}")
+        return []
+
+def get_products():
+    global _products_cache
+    with vector_store_lock:
+        # Built and published under the lock so an upload finishing meanwhile
+        # can't be merged into a set that is then overwritten
+        if _products_cache is None:
+            products = set()
+            for doc in get_vector_store().documents:
+                if "product" in doc and doc["product"]:
+                    products.add(doc["product"])
+            _products_cache = products
+        return _products_cache
 
 # Home page
 @app.route('/')
@@ -39,22 +125,69 @@ def index():
 # Admin dashboard
 @app.route('/admin')
 def admin():
-    # Get list of uploaded manuals
-    manuals = []
-    try:
-        for filename in os.listdir(UPLOAD_FOLDER):
-            if filename.endswith('.pdf'):
-                manuals.append(filename)
-    except Exception as e:
-        logger.error(f"Error reading manuals directory: {str(e)}")
+    logger.info(f"Query embedding cache: {embed_query.cache_info()}")
     
-    # Get list of products from vector store
-    products = set()
-    for doc in vector_store.documents:
-        if "product" in doc and doc["product"]:
-            products.add(doc["product"])
+    return render_template('admin.html', manuals=list(get_manuals()), products=list(get_products()))
+
+def submit_pdf(filepath, product_name):
+    # A child process that dies (malformed PDF, OOM kill) breaks the whole
+    # pool for good, so replace it and retry once
+    global pdf_pool
+    with pdf_pool_lock:
+        try:
+            return pdf_pool.submit(process_pdf, filepath, product_name)
+        except BrokenProcessPool:
+            logger.warning("PDF process pool is broken; starting a new one")
+            pdf_pool.shutdown(wait=False)
+            pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+            return pdf_pool.submit(process_pdf, filepath, product_name)
+
+def prune_upload_jobs():
+    # Forget finished jobs once they have been reportable for UPLOAD_JOB_TTL
+    cutoff = time.time() - UPLOAD_JOB_TTL
+    for job_id, job in list(upload_jobs.items()):
+        finished_at = job.get("finished_at")
+        if finished_at is not None and finished_at < cutoff:
+            upload_jobs.pop(job_id, None)
+
+def run_on_native_thread(fn, *args):
+    # Under gevent, concurrent.futures threads are greenlets on the single hub,
+    # so CPU-bound work there would stall every request. Hand it to gevent's
+    # pool of real OS threads instead; without gevent the caller already is one.
+    if get_hub is not None and is_module_patched('threading'):
+        get_hub().threadpool.spawn(fn, *args)
+    else:
+        fn(*args)
+
+def index_chunks(job_id, filename, future):
+    # Runs on a native thread once a background process_pdf() finishes.
+    # add_documents() embeds the chunks inside VectorStore, so the store lock
+    # covers the embedding as well as the append; requests that don't touch
+    # the store keep being served meanwhile.
+    global _products_cache
     
-    return render_template('admin.html', manuals=manuals, products=list(products))
+    job = upload_jobs[job_id]
+    try:
+        chunks = future.result()
+        logger.info(f"Generated {len(chunks)} chunks from {filename}")
+        
+        with vector_store_lock:
+            get_vector_store().add_documents(chunks)
+            if _products_cache is not None:
+                # Swap in a new set so concurrent readers never see it change
+                _products_cache = _products_cache | {c["product"] for c in chunks if c.get("product")}
+        semantic_cache.clear()  # Cached answers may be stale with new manuals
+        
+        job.update(status="done", message=f"File {filename} processed with {len(chunks)} chunks")
+    except CancelledError:
+        # Not an Exception subclass, so it needs its own handler
+        logger.error(f"Processing of {filename} was cancelled")
+        job.update(status="error", error="Processing was cancelled")
+    except Exception as e:
+        logger.error(f"Error processing PDF: {str(e)}", exc_info=True)
+        job.update(status="error", error=str(e))
+    finally:
+        job["finished_at"] = time.time()
 
 # Handle file uploads
 @app.route('/upload', methods=['POST'])
@@ -71,20 +204,27 @@ def upload_file():
         try:
             filename = secure_filename(file.filename)
             filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            # Copy in 1MB blocks rather than FileStorage.save()'s 16KB default
+            with open(filepath, 'wb') as out:
+                shutil.copyfileobj(file.stream, out, length=1024 * 1024)
             
-            # Process the PDF and add to vector store
+            # Process the PDF in the background and add it to the vector store when done
             product_name = request.form.get('product_name', os.path.splitext(filename)[0])
             logger.info(f"Processing PDF: {filename} for product: {product_name}")
             
-            chunks = process_pdf(filepath, product_name)
-            logger.info(f"Generated {len(chunks)} chunks from {filename}")
+            prune_upload_jobs()
+            future = submit_pdf(filepath, product_name)
+            
+            # Register the job only once it is actually queued
+            job_id = uuid.uuid4().hex
+            upload_jobs[job_id] = {"status": "processing", "filename": filename}
+            future.add_done_callback(partial(run_on_native_thread, index_chunks, job_id, filename))
             
-            vector_store.add_documents(chunks)
             return jsonify({
-                "success": True, 
-                "message": f"File {filename} processed with {len(chunks)} chunks"
-            }), 200
+                "success": True,
+                "job_id": job_id,
+                "message": f"File {filename} is being processed"
+            }), 202
             
         except Exception as e:
             logger.error(f"Error processing PDF: {str(e)}", exc_info=True)
@@ -92,6 +232,14 @@ def upload_file():
     else:
         return jsonify({"error": "File type not allowed"}), 400
 
+# Report the progress of a background upload
+@app.route('/upload/status/<job_id>', methods=['GET'])
+def upload_status(job_id):
+    job = upload_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job)
+
 # Handle chat queries
 @app.route('/query', methods=['POST'])
 def query():
@@ -105,14 +253,9 @@ def query():
         
         logger.info(f"Query received: '{query_text}' for product: {product_filter}")
         
-        # Store last query in session for context
-        if 'history' not in session:
-            session['history'] = []
-        
-        # Add query to history (max 5 recent queries)
-        session['history'].append(query_text)
-        if len(session['history']) > 5:
-            session['history'] = session['history'][-5:]
+        # Store last query in session for context (max 5 recent queries).
+        # Assign a new list so the session is marked modified and saved.
+        session['history'] = (session.get('history', []) + [query_text])[-5:]
         
         # Enhance query with recent history for better context
         enhanced_query = query_text
@@ -120,13 +263,29 @@ def query():
             recent_context = " ".join(session['history'][:-1])
             enhanced_query = f"{recent_context}\n\nCurrent question: {query_text}"
         
+        # Answer near-duplicate questions from the semantic cache, skipping search and the LLM.
+        # The key is the question alone: the cached answer is to query_text, and
+        # history-prefixed queries from one session would all look alike.
+        cache_generation = semantic_cache.generation
+        query_embedding = embed_query(query_text)
+        if query_embedding is not None:
+            cached = semantic_cache.get(query_embedding, scope=product_filter)
+            if cached is not None:
+                logger.info("Semantic cache hit")
+                response, sources = cached
+                return jsonify({
+                    "response": response,
+                    "sources": sources
+                })
+        
         # Get similar documents from vector store (more documents for better context)
         num_docs = 5  # Get more documents to ensure enough context
         
-        if product_filter:
-            similar_docs = vector_store.search_by_product(enhanced_query, product_filter, k=num_docs)
-        else:
-            similar_docs = vector_store.search(enhanced_query, k=num_docs)
+        with vector_store_lock:
+            if product_filter:
+                similar_docs = get_vector_store().search_by_product(enhanced_query, product_filter, k=num_docs)
+            else:
+                similar_docs = get_vector_store().search(enhanced_query, k=num_docs)
         
         logger.info(f"Found {len(similar_docs)} relevant chunks")
         
@@ -137,12 +296,17 @@ def query():
             })
         
         # Use Groq to generate a response with the enhanced context
-        response_data = groq_client.generate_response(
+        response_data = get_groq_client().generate_response(
             query_text, 
             similar_docs,
             product_name=product_filter
         )
         
+        if query_embedding is not None:
+            semantic_cache.put(query_embedding, response_data["answer"],
+                               response_data["sources"], scope=product_filter,
+                               generation=cache_generation)
+        
         return jsonify({
             "response": response_data["answer"],
             "sources": response_data["sources"]
@@ -155,6 +319,21 @@ def query():
             "error": str(e)
         }), 500
 
+def recognize_speech(audio_path):
+    # Runs on stt_pool; owns the temporary audio file and always removes it
+    try:
+        from speech_recognition import Recognizer, AudioFile
+        
+        recognizer = Recognizer()
+        # Give up on the API call just before the request does, so a hung call
+        # frees its pool thread instead of holding it forever
+        recognizer.operation_timeout = STT_TIMEOUT - 2
+        with AudioFile(audio_path) as source:
+            audio_data = recognizer.record(source)
+        return recognizer.recognize_google(audio_data)
+    finally:
+        os.remove(audio_path)
+
 # Speech-to-text endpoint
 @app.route('/speech-to-text', methods=['POST'])
 def speech_to_text():
@@ -171,31 +350,21 @@ def speech_to_text():
     audio_file.save(temp_path)
     
     try:
-        from speech_recognition import Recognizer, AudioFile
-        
-        recognizer = Recognizer()
-        with AudioFile(temp_path) as source:
-            audio_data = recognizer.record(source)
-            text = recognizer.recognize_google(audio_data)
-        
-        os.remove(temp_path)  # Clean up
+        text = stt_pool.submit(recognize_speech, temp_path).result(timeout=STT_TIMEOUT)
         logger.info(f"Speech recognized: '{text}'")
         return jsonify({"text": text})
+    except FutureTimeoutError:
+        logger.error("Speech recognition timed out")
+        return jsonify({"error": "Speech recognition timed out"}), 504
     except Exception as e:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
         logger.error(f"Speech recognition error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 # List available products
 @app.route('/products', methods=['GET'])
 def list_products():
-    products = set()
-    for doc in vector_store.documents:
-        if "product" in doc and doc["product"]:
-            products.add(doc["product"])
-    
-    return jsonify({"products": list(products)})
+    return jsonify({"products": list(get_products())})
 
+# Development server only; deploy with `gunicorn wsgi:app` (see gunicorn.conf.py)
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
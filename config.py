@@ -11,7 +11,11 @@ UPLOAD_FOLDER = os.path.join(BASE_DIR, "data", "manuals")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 # Allowed file extensions
-ALLOWED_EXTENSIONS = {'pdf', 'txt', 'docx'}
+ALLOWED_EXTENSIONS = frozenset({'pdf', 'txt', 'docx'})
+
+# Server-side session storage
+SESSION_FOLDER = os.path.join(BASE_DIR, "data", "sessions")
+os.makedirs(SESSION_FOLDER, exist_ok=True)
 
 # Vector store config
 VECTOR_STORE_PATH = os.path.join(BASE_DIR, "data")
@@ -0,0 +1,20 @@
+import os
+
+# Gunicorn loads this file automatically when started from this directory.
+# Listen on localhost only unless BIND says otherwise: /admin and /upload
+# have no authentication.
+bind = os.environ.get("BIND", "127.0.0.1:8000")
+
+# /query spends most of its time waiting on the Groq API, so a gevent worker
+# keeps serving other requests while one is parked on network I/O.
+# Keep a single worker: the vector store, upload jobs, listing caches and
+# semantic cache are per-process state, so extra workers would not see
+# manuals uploaded through another worker.
+# All greenlets share one hub, so CPU-bound work (embedding, search) blocks
+# every request while it runs; long jobs such as indexing an uploaded PDF
+# are pushed to native threads or processes (see app2.py).
+workers = 1
+worker_class = "gevent"
+
+# LLM calls and PDF processing can run well past the 30s default
+timeout = 120
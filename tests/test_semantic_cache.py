@@ -0,0 +1,134 @@
+import numpy as np
+
+from utils.semantic_cache import SemanticCache
+
+
+def unit(*values):
+    vec = np.array(values, dtype=np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+def at_similarity(base, similarity):
+    """Return a unit vector whose cosine similarity to ``base`` is ``similarity``."""
+    orthogonal = np.zeros_like(base)
+    orthogonal[np.argmin(np.abs(base))] = 1.0
+    orthogonal -= np.dot(orthogonal, base) * base
+    orthogonal /= np.linalg.norm(orthogonal)
+    return similarity * base + np.sqrt(1 - similarity ** 2) * orthogonal
+
+
+def test_hit_at_or_above_threshold():
+    cache = SemanticCache(threshold=0.95)
+    base = unit(1, 2, 3)
+    cache.put(base, "answer", ["manual.pdf"])
+
+    assert cache.get(base) == ("answer", ["manual.pdf"])
+    assert cache.get(at_similarity(base, 0.96)) == ("answer", ["manual.pdf"])
+
+
+def test_miss_below_threshold():
+    cache = SemanticCache(threshold=0.95)
+    base = unit(1, 2, 3)
+    cache.put(base, "answer", [])
+
+    assert cache.get(at_similarity(base, 0.9)) is None
+
+
+def test_unnormalized_embeddings_compare_by_cosine():
+    cache = SemanticCache()
+    cache.put([2.0, 0.0, 0.0], "answer", [])
+
+    assert cache.get([5.0, 0.0, 0.0]) == ("answer", [])
+
+
+def test_scopes_are_isolated():
+    cache = SemanticCache()
+    vec = unit(1, 0, 0)
+    cache.put(vec, "dreamstation answer", [], scope="DreamStation")
+
+    assert cache.get(vec) is None
+    assert cache.get(vec, scope="IntelliVue") is None
+    assert cache.get(vec, scope="DreamStation") == ("dreamstation answer", [])
+
+
+def test_best_match_within_scope_is_used():
+    cache = SemanticCache()
+    vec = unit(1, 0, 0)
+    cache.put(vec, "other product", [], scope="Azurion")
+    cache.put(at_similarity(vec, 0.97), "same product", [], scope="Epiq")
+
+    assert cache.get(vec, scope="Epiq") == ("same product", [])
+
+
+def test_evicts_least_recently_used():
+    cache = SemanticCache(capacity=2)
+    a, b, c = unit(1, 0, 0), unit(0, 1, 0), unit(0, 0, 1)
+    cache.put(a, "a", [])
+    cache.put(b, "b", [])
+    cache.get(a)  # a is now more recently used than b
+    cache.put(c, "c", [])
+
+    assert len(cache) == 2
+    assert cache.get(b) is None
+    assert cache.get(a) == ("a", [])
+    assert cache.get(c) == ("c", [])
+
+
+def test_evicted_row_is_reused_for_new_entry():
+    cache = SemanticCache(capacity=2)
+    a, b, c, d = unit(1, 0, 0, 0), unit(0, 1, 0, 0), unit(0, 0, 1, 0), unit(0, 0, 0, 1)
+    cache.put(a, "a", [], scope="x")
+    cache.put(b, "b", [])
+    cache.put(c, "c", [])  # evicts a
+    cache.put(d, "d", [])  # evicts b
+
+    assert cache.get(a, scope="x") is None
+    assert cache.get(b) is None
+    assert cache.get(c) == ("c", [])
+    assert cache.get(d) == ("d", [])
+
+
+def test_no_hit_after_clear_and_reuse():
+    cache = SemanticCache()
+    vec = unit(1, 1, 0)
+    cache.put(vec, "old", [])
+    cache.clear()
+
+    assert len(cache) == 0
+    assert cache.get(vec) is None
+
+    cache.put(vec, "new", [])
+    assert cache.get(vec) == ("new", [])
+
+
+def test_put_from_before_clear_is_dropped():
+    cache = SemanticCache()
+    vec = unit(1, 0, 1)
+    generation = cache.generation
+    cache.clear()
+    cache.put(vec, "stale", [], generation=generation)
+
+    assert cache.get(vec) is None
+
+    cache.put(vec, "fresh", [], generation=cache.generation)
+    assert cache.get(vec) == ("fresh", [])
+
+
+def test_dimension_change_resets_cache():
+    cache = SemanticCache()
+    cache.put(unit(1, 0, 0), "3d", [])
+
+    assert cache.get(unit(1, 0, 0, 0)) is None
+
+    cache.put(unit(1, 0, 0, 0), "4d", [])
+    assert cache.get(unit(1, 0, 0, 0)) == ("4d", [])
+    assert cache.get(unit(1, 0, 0)) is None
+
+
+def test_returned_sources_are_copies():
+    cache = SemanticCache()
+    vec = unit(0, 1, 1)
+    cache.put(vec, "answer", ["manual.pdf"])
+    cache.get(vec)[1].append("mutated.pdf")
+
+    assert cache.get(vec) == ("answer", ["manual.pdf"])
@@ -0,0 +1,27 @@
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson.
+
+    Used for jsonify() responses and request.json parsing. Types orjson can't
+    encode natively fall back to Flask's default handling. ``sort_keys`` (on
+    by default) and ``indent`` (debug pretty-printing) are honoured, but any
+    indent is rendered as two spaces. ``ensure_ascii`` and ``separators`` are
+    ignored: output is always UTF-8 with compact separators. Dates and
+    datetimes are encoded natively by orjson as ISO 8601 strings rather than
+    Flask's HTTP-date format.
+    """
+
+    def dumps(self, obj, **kwargs):
+        option = 0
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        default = kwargs.get("default", self.default)
+        return orjson.dumps(obj, default=default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
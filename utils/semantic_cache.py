@@ -0,0 +1,95 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SemanticCache:
+    """LRU cache of answers keyed on query embeddings.
+
+    A lookup returns the cached answer for the most similar stored query when
+    its cosine similarity reaches ``threshold``. Embeddings live in one
+    contiguous (capacity, d) float32 matrix so the scan is a single dot product.
+
+    ``clear()`` starts a new generation. Callers capture ``generation`` before
+    doing the work behind an answer and pass it to ``put()``, which drops
+    answers computed before the most recent ``clear()``.
+    """
+
+    def __init__(self, capacity=256, threshold=0.95):
+        self.capacity = capacity
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._matrix = None  # (capacity, d) normalized embeddings
+        self._scopes = np.empty(capacity, dtype=object)  # scope of each row
+        self._size = 0
+        self._entries = OrderedDict()  # row -> entry, least recently used first
+        self._generation = 0
+
+    @property
+    def generation(self):
+        return self._generation
+
+    @staticmethod
+    def _normalize(embedding):
+        vec = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def get(self, embedding, scope=None):
+        """Return (response, sources) for a similar cached query, or None."""
+        query = self._normalize(embedding)
+        with self._lock:
+            n = self._size
+            if n == 0 or self._matrix.shape[1] != query.shape[0]:
+                return None
+
+            scores = np.dot(self._matrix[:n], query)
+            scores[self._scopes[:n] != scope] = -np.inf
+
+            row = int(np.argmax(scores))
+            if scores[row] < self.threshold:
+                return None
+
+            entry = self._entries[row]
+            entry["hits"] += 1
+            self._entries.move_to_end(row)
+            return entry["response"], list(entry["sources"])
+
+    def put(self, embedding, response, sources, scope=None, generation=None):
+        """Cache an answer, evicting the least recently used entry when full.
+
+        Does nothing if ``generation`` is given and the cache was cleared since.
+        """
+        vec = self._normalize(embedding)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            if self._matrix is None or self._matrix.shape[1] != vec.shape[0]:
+                self._matrix = np.empty((self.capacity, vec.shape[0]), dtype=np.float32)
+                self._size = 0
+                self._entries.clear()
+
+            if self._size < self.capacity:
+                row = self._size
+                self._size += 1
+            else:
+                row, _ = self._entries.popitem(last=False)
+
+            self._matrix[row] = vec
+            self._scopes[row] = scope
+            self._entries[row] = {
+                "embedding": self._matrix[row],
+                "response": response,
+                "sources": list(sources),
+                "hits": 0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._size = 0
+            self._entries.clear()
+            self._generation += 1
+
+    def __len__(self):
+        return len(self._entries)
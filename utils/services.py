@@ -0,0 +1,47 @@
+import importlib
+import logging
+import threading
+from functools import lru_cache, wraps
+
+logger = logging.getLogger(__name__)
+
+
+def lazy_singleton(factory):
+    """Return a getter that builds ``factory()`` on first call and reuses it.
+
+    Construction is deferred until a request needs the service, which keeps
+    worker startup fast, and is locked so concurrent first requests share
+    one instance.
+    """
+    lock = threading.Lock()
+    create = lru_cache(maxsize=1)(factory)
+
+    @wraps(factory)
+    def get():
+        with lock:
+            return create()
+
+    get.cache_clear = create.cache_clear
+    return get
+
+
+# The service modules are imported inside the factories so their heavy
+# dependencies (e.g. the embedding model library) load on first use too
+def _vector_store_factory(module_name):
+    def create():
+        module = importlib.import_module(module_name)
+        store = module.VectorStore()
+        if not hasattr(store, '_embed'):
+            logger.warning(f"{module_name}.VectorStore has no _embed(); the semantic query cache is disabled")
+        return store
+    return create
+
+
+def _create_groq_client():
+    from utils.groq_client import GroqClient
+    return GroqClient()
+
+
+get_vector_store = lazy_singleton(_vector_store_factory('utils.vector_store'))
+get_vector_store1 = lazy_singleton(_vector_store_factory('utils.vector_store1'))  # used by app.py
+get_groq_client = lazy_singleton(_create_groq_client)
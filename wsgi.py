@@ -0,0 +1,3 @@
+# Production entry point, served by Gunicorn with the settings in gunicorn.conf.py:
+#   gunicorn wsgi:app
+from app2 import app